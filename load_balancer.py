@@ -1,90 +1,484 @@
+import os
+import sys
+import queue
 import socket
+import random
+import signal
 import asyncio
+import logging
+import logging.handlers
 import itertools
 import time
+from typing import Any, Callable, Final, Optional
+
+try:
+    import uvloop # Optional: a faster libuv-based event loop
+except ImportError:
+    uvloop = None # type: ignore[assignment]
 
 # ----------------------------------------------------
 # 1. Configuration
 # ----------------------------------------------------
-# The list of backend servers (the "upstreams") with their state
-SERVER_STATE = [
-    {'host': '127.0.0.1', 'port' : 8081, 'healthy': True, 'name': "Server 1"},
-    {'host': '127.0.0.1', 'port' : 8082, 'healthy': True, 'name': "Server 2"},
+# The list of backend servers (the "upstreams")
+SERVER_STATE: Final[list[dict[str, Any]]] = [
+    {'host': '127.0.0.1', 'port' : 8081, 'name': "Server 1"},
+    {'host': '127.0.0.1', 'port' : 8082, 'name': "Server 2"},
 ]
 
-LISTEN_PORT = 8000
+# Prebuilt (host, port) of each server, indexed by server number. The hot path uses
+# these tuples directly as connect addresses and pool keys; the SERVER_STATE dicts
+# are only read when logging.
+ENDPOINTS: Final[list[tuple[str, int]]] = [(server['host'], server['port']) for server in SERVER_STATE]
+NUM_SERVERS: Final = len(ENDPOINTS)
+
+# Last probe result of each server, indexed by server number
+HEALTH: Final[list[bool]] = [True] * NUM_SERVERS
+
+# Indices of the currently healthy servers, derived from HEALTH. The health checker
+# rebuilds the list and swaps it in with one assignment, so readers always see a
+# consistent snapshot.
+HEALTHY_IDX: list[int] = list(range(NUM_SERVERS))
+
+# Requests currently being proxied to each server, indexed by server number
+INFLIGHT: Final[list[int]] = [0] * NUM_SERVERS
+
+# 'p2c' (power of two random choices) or 'round_robin'
+BALANCING_MODE: Final = 'p2c'
+
+LISTEN_PORT: Final = 8000
+LISTEN_BACKLOG: Final = 4096
+
+# Kernel send/receive buffer size for client and backend sockets
+SOCKET_BUFFER_SIZE: Final = 1 << 20
+
+# Worker processes, each with its own event loop and its own listening socket.
+# SO_REUSEPORT lets the kernel spread incoming connections across them.
+WORKER_COUNT: Final = os.cpu_count() or 1
+
+# INFO reports startup and health changes; DEBUG adds a line per connection event
+LOG_LEVEL: Final = logging.INFO
+logger: Final = logging.getLogger('lb')
+
+# Idle keep-alive backend connections, keyed by endpoint and reused by later requests
+BACKEND_POOLS: Final[dict[tuple[str, int], 'asyncio.Queue[socket.socket]']] = {}
+BACKEND_POOL_SIZE: Final = 32
+
+RECV_SIZE: Final = 65536
+MAX_HEAD_SIZE: Final = 65536
+
+# 503 Service Unavailable HTTP Response, built once at import time
+SERVICE_UNAVAILABLE_BODY: Final = b"Service Unavailable. No healthy backend servers.\n"
+SERVICE_UNAVAILABLE_RESPONSE: Final = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Connection: close\r\n" # Explicitly tell curl we are closing
+    b"Content-Length: " + str(len(SERVICE_UNAVAILABLE_BODY)).encode('ascii') + b"\r\n"
+    b"\r\n"
+    + SERVICE_UNAVAILABLE_BODY
+)
+
+# On Linux, response bytes are moved backend -> pipe -> client with splice(2),
+# so they never have to be copied into the Python process
+USE_SPLICE: Final = hasattr(os, 'splice')
+SPLICE_CHUNK: Final = 65536
+if USE_SPLICE:
+    SPLICE_FLAGS: Final = os.SPLICE_F_MOVE | os.SPLICE_F_MORE | os.SPLICE_F_NONBLOCK
 
-# Global index and lock
-RR_INDEX = 0
-STATE_LOCK = asyncio.Lock()
+# Global round-robin index. It is only touched from the event loop thread and
+# get_next_server never awaits, so no lock is needed around it.
+RR_INDEX: int = 0
 
-async def get_next_server():
-    """Retrieves the next HEALTHY backend server using the Round Robin algorithm."""
+def get_next_server() -> int:
+    """Picks a HEALTHY backend server according to BALANCING_MODE and returns its index."""
     global RR_INDEX
-    
-    # Use the async lock to ensure only one coroutine modifies RR_INDEX and checks state
-    async with STATE_LOCK: 
-        start_index = RR_INDEX
-        num_servers = len(SERVER_STATE)
-        
-        while True:
-            server = SERVER_STATE[RR_INDEX]
-            
-            # Move the index for the next request attempt
-            RR_INDEX = (RR_INDEX + 1) % num_servers
-            
-            if server['healthy']:
-                return (server['host'], server['port'])
-            
-            # If we've checked every server and came back to the start, all are down
-            if RR_INDEX == start_index:
-                raise Exception("No healthy servers available.")
-
-async def health_checker_async():
+
+    healthy = HEALTHY_IDX
+    if not healthy:
+        raise Exception("No healthy servers available.")
+
+    if BALANCING_MODE == 'p2c' and len(healthy) > 1:
+        # Of two random healthy servers, take the one with fewer requests in flight
+        first, second = random.sample(healthy, 2)
+        return first if INFLIGHT[first] <= INFLIGHT[second] else second
+
+    # Rotate over the healthy servers only, so the pick is one modulo and one index
+    position = RR_INDEX % len(healthy)
+    RR_INDEX = position + 1
+    return healthy[position]
+
+async def probe_server(endpoint: tuple[str, int]) -> bool:
+    """Returns True if a TCP connection to the backend can be opened within 1 second."""
+    try:
+        _, probe_writer = await asyncio.wait_for(asyncio.open_connection(*endpoint), 1)
+        probe_writer.close()
+        await probe_writer.wait_closed()
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+async def health_checker_async() -> None:
     """Periodically checks the health of all backend servers."""
+    global HEALTHY_IDX
+
     while True:
         await asyncio.sleep(5) # Wait asynchronously for 5 seconds
 
-        # Acquire lock before modifying the shared state
-        async with STATE_LOCK:
-            for server in SERVER_STATE:
-                host = server['host']
-                port = server['port']
-                is_healthy = False
-                
-                try:
-                    probe_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    probe_sock.settimeout(1)
-                    probe_sock.connect((host, port))
-                    probe_sock.close()
-                    is_healthy = True
-                except socket.error:
-                    is_healthy = False
-                
-                # Update the server state
-                if server['healthy'] != is_healthy:
-                    server['healthy'] = is_healthy
-                    status = "UP" if is_healthy else "DOWN"
-                    print(f"\n[HEALTH CHECK ALERT] Server {server['name']} ({host}:{port}) is now {status}!")
-    
-async def async_proxy_handler(client_reader, client_writer):
+        # Probe every backend concurrently without blocking the event loop
+        results = await asyncio.gather(*(probe_server(endpoint) for endpoint in ENDPOINTS))
+
+        # Record the results, reporting state transitions
+        for index, is_healthy in enumerate(results):
+            if HEALTH[index] != is_healthy:
+                HEALTH[index] = is_healthy
+                server = SERVER_STATE[index]
+                status = "UP" if is_healthy else "DOWN"
+                logger.warning(f"[HEALTH CHECK ALERT] Server {server['name']} ({server['host']}:{server['port']}) is now {status}!")
+
+        # Publish the new state in a single assignment
+        HEALTHY_IDX = [index for index in range(NUM_SERVERS) if HEALTH[index]]
+
+async def wait_for_fd(add_callback: Callable[..., Any], remove_callback: Callable[[int], Any], fd: int) -> None:
+    """Suspends until the event loop reports fd as ready (readable or writable)."""
+    ready = asyncio.get_running_loop().create_future()
+
+    def on_ready() -> None:
+        if not ready.done():
+            ready.set_result(None)
+
+    add_callback(fd, on_ready)
+    try:
+        await ready
+    finally:
+        remove_callback(fd)
+
+async def splice_shunt(src_fd: int, dst_fd: int, pipe: tuple[int, int], count: Optional[int] = None) -> None:
+    """Moves count bytes (or everything until EOF) from src_fd to dst_fd through the kernel pipe (read end, write end)."""
+    loop = asyncio.get_running_loop()
+    pipe_r, pipe_w = pipe
+
+    # The waits happen after the try statements rather than in the except clauses:
+    # mypyc-compiled code re-raises a caught exception if its handler awaits
+    while count is None or count > 0:
+        blocked = False
+        try:
+            moved = os.splice(src_fd, pipe_w, SPLICE_CHUNK if count is None else min(count, SPLICE_CHUNK), flags=SPLICE_FLAGS)
+        except BlockingIOError:
+            blocked = True
+        if blocked:
+            await wait_for_fd(loop.add_reader, loop.remove_reader, src_fd)
+            continue
+        if not moved:
+            if count is not None:
+                raise ConnectionResetError("Backend closed the connection mid-response")
+            break
+        if count is not None:
+            count -= moved
+
+        # Flush everything that was just moved into the pipe out to the client, so the
+        # pipe is empty again for the next call
+        while moved:
+            blocked = False
+            try:
+                moved -= os.splice(pipe_r, dst_fd, moved, flags=SPLICE_FLAGS)
+            except BlockingIOError:
+                blocked = True
+            if blocked:
+                await wait_for_fd(loop.add_writer, loop.remove_writer, dst_fd)
+
+def tune_socket(sock: socket.socket) -> None:
+    """Disables Nagle's algorithm and enlarges the kernel buffers of a socket."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+def connection_dropped(backend_sock: socket.socket) -> bool:
+    """Returns True if an idle pooled connection was closed by the backend (or unexpectedly has data)."""
+    try:
+        backend_sock.recv(1, socket.MSG_PEEK)
+    except BlockingIOError:
+        return False # Nothing to read: the connection is still open and idle
+    except OSError:
+        pass
+    return True
+
+async def acquire_backend(endpoint: tuple[str, int], reuse: bool = True) -> tuple[socket.socket, bool]:
+    """Returns (sock, reused): an idle pooled connection to the backend (if reuse), or a freshly opened one."""
+    pool = BACKEND_POOLS.get(endpoint) if reuse else None
+    while pool is not None and not pool.empty():
+        backend_sock = pool.get_nowait()
+        if not connection_dropped(backend_sock):
+            return backend_sock, True
+        backend_sock.close()
+
+    backend_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    backend_sock.setblocking(False)
+    try:
+        tune_socket(backend_sock) # Before connecting, so the receive window is sized from the start
+        await asyncio.get_running_loop().sock_connect(backend_sock, endpoint)
+    except BaseException:
+        backend_sock.close()
+        raise
+    return backend_sock, False
+
+def release_backend(endpoint: tuple[str, int], backend_sock: socket.socket) -> None:
+    """Returns a backend connection to its pool, closing it if the pool is already full."""
+    pool = BACKEND_POOLS.get(endpoint)
+    if pool is None:
+        pool = BACKEND_POOLS[endpoint] = asyncio.Queue(BACKEND_POOL_SIZE)
+    try:
+        pool.put_nowait(backend_sock)
+    except asyncio.QueueFull:
+        backend_sock.close()
+
+async def send_request(endpoint: tuple[str, int], request_data: bytes, reuse: bool = True) -> tuple[socket.socket, bool]:
+    """Sends the initial request bytes over a pooled (if reuse) or new backend connection; returns (sock, reused)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        backend_sock, reused = await acquire_backend(endpoint, reuse)
+        try:
+            await loop.sock_sendall(backend_sock, request_data)
+        except ConnectionError:
+            backend_sock.close()
+            if reused:
+                continue # The backend closed this idle connection; try another one
+            raise
+        except BaseException:
+            backend_sock.close()
+            raise
+        return backend_sock, reused
+
+async def pipe_request(client_reader: asyncio.StreamReader, backend_sock: socket.socket, forwarded: list[int]) -> None:
+    """Forwards whatever else the client sends (e.g. the rest of a large body) to the backend until client EOF.
+
+    forwarded[0] counts the bytes sent this way. A backend connection that got any
+    of them may still owe a response for them, so it must not go back to the pool.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            data = await client_reader.read(RECV_SIZE)
+            if not data:
+                return
+            forwarded[0] += len(data)
+            await loop.sock_sendall(backend_sock, data)
+    except ConnectionError:
+        pass # Either side went away; the response relay reports anything that matters
+
+async def read_until(backend_sock: socket.socket, buf: bytearray, separator: bytes, start: int = 0) -> int:
+    """Receives into buf until it contains separator (searching from start); returns the index just past it."""
+    loop = asyncio.get_running_loop()
+    while True:
+        end = buf.find(separator, start)
+        if end >= 0:
+            return end + len(separator)
+        if len(buf) > MAX_HEAD_SIZE:
+            raise Exception("Backend response headers are too large.")
+        data = await loop.sock_recv(backend_sock, RECV_SIZE)
+        if not data:
+            raise ConnectionResetError("Backend closed the connection mid-response")
+        buf += data
+
+async def relay_bytes(backend_sock: socket.socket, client_sock: socket.socket, buf: bytearray, scratch: memoryview,
+                      pipe: tuple[int, int], count: Optional[int] = None) -> None:
+    """Forwards count bytes (or everything until EOF) to the client, starting with what is already in buf.
+
+    Without splice, the rest is copied through scratch, a memoryview over a
+    buffer that is allocated once per connection and reused for every read.
+    With splice, it moves through pipe, which is likewise opened once per connection.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Bytes that arrived together with earlier reads go out first
+    if buf:
+        taken = len(buf) if count is None else min(count, len(buf))
+        await loop.sock_sendall(client_sock, buf[:taken])
+        del buf[:taken]
+        if count is not None:
+            count -= taken
+            if not count:
+                return
+
+    if USE_SPLICE:
+        await splice_shunt(backend_sock.fileno(), client_sock.fileno(), pipe, count)
+        return
+
+    while count is None or count > 0:
+        received = await loop.sock_recv_into(backend_sock, scratch if count is None else scratch[:count])
+        if not received:
+            if count is not None:
+                raise ConnectionResetError("Backend closed the connection mid-response")
+            break
+        await loop.sock_sendall(client_sock, scratch[:received])
+        if count is not None:
+            count -= received
+
+async def relay_chunked(backend_sock: socket.socket, client_sock: socket.socket, buf: bytearray, scratch: memoryview,
+                        pipe: tuple[int, int], ready: int = 0) -> None:
+    """Forwards a chunked response body to the client, stopping right after the last chunk.
+
+    buf[:ready] holds bytes that still have to be sent (the response head). Every
+    chunk that is already complete in buf is added to them, so a burst of small
+    chunks goes out in a single send instead of one per size line and chunk.
+    """
+    while True:
+        line_end = buf.find(b"\r\n", ready)
+        if line_end < 0:
+            # Flush what is complete, then wait for the next size line
+            if ready:
+                await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, ready)
+                ready = 0
+            line_end = await read_until(backend_sock, buf, b"\r\n") - 2
+
+        size = int(bytes(buf[ready:line_end]).split(b";", 1)[0], 16)
+        if size:
+            # Size line, chunk data and its trailing CRLF
+            chunk_end = line_end + size + 4
+            if chunk_end > len(buf):
+                # Only part of this chunk has arrived: send up to its end, streaming the rest
+                await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, chunk_end)
+                chunk_end = 0
+            ready = chunk_end
+            continue
+
+        # The last chunk is followed by optional trailers and an empty line
+        end = buf.find(b"\r\n\r\n", line_end)
+        if end >= 0:
+            end += 4
+        else:
+            if ready:
+                await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, ready)
+                line_end -= ready
+            end = await read_until(backend_sock, buf, b"\r\n\r\n", line_end)
+        await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, end)
+        return
+
+def parse_response_head(head: bytes) -> tuple[int, Optional[int], bool, bool]:
+    """Returns (status, content_length, chunked, keep_alive) for a raw response head."""
+    lines = head.split(b"\r\n")
+    version, status = lines[0].split(b" ", 2)[:2]
+    content_length: Optional[int] = None
+    chunked = False
+    connection = b""
+
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            content_length = int(value)
+        elif name == b"transfer-encoding":
+            chunked = value.strip().lower().endswith(b"chunked")
+        elif name == b"connection":
+            connection = value.strip().lower()
+
+    if version == b"HTTP/1.0":
+        keep_alive = b"keep-alive" in connection
+    else:
+        keep_alive = b"close" not in connection
+    return int(status), content_length, chunked, keep_alive
+
+def mark_connection_close(buf: bytearray, head_end: int) -> int:
+    """Rewrites the response head in buf[:head_end] to announce Connection: close; returns its new length.
+
+    The client connection is closed after one response, so the client must not
+    take the backend's keep-alive for its own and send another request on it.
+    """
+    lines = bytes(buf[:head_end - 4]).split(b"\r\n")
+    kept = [line for line in lines[1:] if line.partition(b":")[0].strip().lower() not in (b"connection", b"keep-alive")]
+    head = b"\r\n".join([lines[0], *kept, b"Connection: close"]) + b"\r\n\r\n"
+    buf[:head_end] = head
+    return len(head)
+
+def request_length(request_data: bytes) -> Optional[int]:
+    """Returns the length of the first request in request_data, or None if it is incomplete or malformed."""
+    head_end = request_data.find(b"\r\n\r\n")
+    if head_end < 0:
+        return None
+    head_end += 4
+    content_length = 0
+    chunked = False
+
+    try:
+        for line in request_data[:head_end].split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                content_length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = value.strip().lower().endswith(b"chunked")
+
+        if not chunked:
+            end = head_end + content_length
+            return end if end <= len(request_data) else None
+
+        # Walk the chunks of the body up to the last one and its trailers
+        position = head_end
+        while True:
+            line_end = request_data.find(b"\r\n", position)
+            if line_end < 0:
+                return None
+            size = int(request_data[position:line_end].split(b";", 1)[0], 16)
+            if not size:
+                end = request_data.find(b"\r\n\r\n", line_end)
+                return end + 4 if end >= 0 else None
+            position = line_end + size + 4
+    except ValueError:
+        return None
+
+async def relay_response(backend_sock: socket.socket, client_sock: socket.socket, buf: bytearray, head_request: bool,
+                         replied: list[bool]) -> bool:
+    """Forwards one full response to the client; returns True if the backend connection can be reused.
+
+    replied[0] is set once response bytes start going to the client, after which
+    an error can no longer be answered with a 503 of its own.
+    """
+    # The splice path never copies the body through Python, so it gets an empty scratch
+    # buffer; it moves the body through one pipe that serves every part of the response
+    scratch = memoryview(bytearray(0 if USE_SPLICE else RECV_SIZE))
+    pipe = os.pipe() if USE_SPLICE else (-1, -1)
+
+    try:
+        while True:
+            head_end = await read_until(backend_sock, buf, b"\r\n\r\n")
+            status, content_length, chunked, keep_alive = parse_response_head(bytes(buf[:head_end]))
+            replied[0] = True
+            if 100 <= status < 200 and status != 101:
+                # Interim response (e.g. 100 Continue); the real one follows
+                await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, head_end)
+                continue
+            break
+
+        if status != 101: # A protocol switch keeps its Connection: Upgrade
+            head_end = mark_connection_close(buf, head_end)
+
+        if head_request or status in (204, 304):
+            await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, head_end)
+        elif chunked:
+            # The head goes out together with the first buffered chunks
+            await relay_chunked(backend_sock, client_sock, buf, scratch, pipe, head_end)
+        elif content_length is not None:
+            await relay_bytes(backend_sock, client_sock, buf, scratch, pipe, head_end + content_length)
+        else:
+            # The body runs until the backend closes the connection
+            await relay_bytes(backend_sock, client_sock, buf, scratch, pipe)
+            return False
+
+        # Anything left over means the backend sent more than one response
+        return keep_alive and not buf
+    finally:
+        if USE_SPLICE:
+            os.close(pipe[0])
+            os.close(pipe[1])
+
+async def async_proxy_handler(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
     """Handles an incoming client connection asynchronously."""
-    
-    # 503 Service Unavailable HTTP Response
-    RESPONSE_BODY = b"Service Unavailable. No healthy backend servers.\n"
-    CONTENT_LENGTH = str(len(RESPONSE_BODY)).encode('utf-8')
-    
-    SERVICE_UNAVAILABLE_RESPONSE = (
-        b"HTTP/1.1 503 Service Unavailable\r\n"
-        b"Content-Type: text/plain\r\n"
-        b"Connection: close\r\n" # Explicitly tell curl we are closing
-        b"Content-Length: " + CONTENT_LENGTH + b"\r\n"
-        b"\r\n"
-        + RESPONSE_BODY
-    )
 
     client_addr = client_writer.get_extra_info('peername')
-    print(f"Incoming connection from {client_addr[0]}:{client_addr[1]}")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug(f"Incoming connection from {client_addr[0]}:{client_addr[1]}")
+    backend_sock: Optional[socket.socket] = None
+    reusable = False
+    replied = [False]
 
     try:
         # 1. Get request data from client
@@ -93,76 +487,198 @@ async def async_proxy_handler(client_reader, client_writer):
             return
         
         # 2. Select a healthy backend server
-        backend_host, backend_port = await get_next_server()
-        print(f"[{client_addr[0]}:{client_addr[1]}] -> Routing to {backend_host}:{backend_port}")
+        backend_index = get_next_server()
+        backend_endpoint = ENDPOINTS[backend_index]
+        if debug:
+            logger.debug(f"[{client_addr[0]}:{client_addr[1]}] -> Routing to {backend_endpoint[0]}:{backend_endpoint[1]}")
 
-        # 3. Connect to the selected backend server asynchronously
-        backend_reader, backend_writer = await asyncio.open_connection(backend_host, backend_port)
+        INFLIGHT[backend_index] += 1
+        try:
+            # 3. Forward the request over a pooled (or new) keep-alive backend connection
+            backend_sock, reused = await send_request(backend_endpoint, request_data)
+            head_request = request_data.startswith(b"HEAD ")
 
-        # 4. Modify and forward the request
-        request_str = request_data.decode('utf-8').replace('Connection: keep-alive', 'Connection: close')
-        backend_writer.write(request_str.encode('utf-8'))
-        await backend_writer.drain() # Ensure the data is written immediately
+            # 4. Proxy both directions at once: further request bytes keep flowing to the
+            # backend while the response is shunted to the client. The client transport owns
+            # its descriptor, so write through a duplicate that the event loop can poll.
+            with client_writer.get_extra_info('socket').dup() as client_sock:
+                while True:
+                    forwarded = [0]
+                    response_buf = bytearray()
+                    upstream = asyncio.create_task(pipe_request(client_reader, backend_sock, forwarded))
+                    downstream = asyncio.create_task(
+                        relay_response(backend_sock, client_sock, response_buf, head_request, replied)
+                    )
+                    failure: Optional[BaseException] = None
+                    try:
+                        await asyncio.wait((upstream, downstream), return_when=asyncio.FIRST_COMPLETED)
+                        half_closed = not downstream.done()
+                        if half_closed:
+                            # The client stopped sending: pass its EOF on, then finish the response
+                            backend_sock.shutdown(socket.SHUT_WR)
+                        # The backend may still owe responses for anything the client sent after
+                        # the first request (another pipelined request or excess body bytes)
+                        reusable = (await downstream and not half_closed and not forwarded[0]
+                                    and request_length(request_data) == len(request_data))
+                    except BaseException as e:
+                        failure = e
 
-        # 5. Shunt response data from backend to client
-        while True:
-            # Asynchronously read chunks from the backend
-            part = await backend_reader.read(4096)
-            if not part:
-                break
+                    # Both directions are stopped and awaited after the try statement, not in a
+                    # finally clause: mypyc-compiled code re-raises caught exceptions there
+                    upstream.cancel()
+                    downstream.cancel()
+                    await asyncio.wait((upstream, downstream))
+                    if failure is None and not upstream.cancelled():
+                        failure = upstream.exception()
+                    if failure is None:
+                        break
+
+                    reusable = False
+                    # Only safe to resend if the backend never answered and saw nothing but request_data
+                    if (not isinstance(failure, ConnectionError) or not reused
+                            or response_buf or replied[0] or forwarded[0]):
+                        raise failure
 
-            # Asynchronously write chunks to the client
-            client_writer.write(part)
-            await client_writer.drain() # Ensure the data is sent immediately
+                    # The backend closed this pooled connection before answering; resend on a new one
+                    backend_sock.close()
+                    backend_sock = None
+                    backend_sock, reused = await send_request(backend_endpoint, request_data, reuse=False)
+        finally:
+            INFLIGHT[backend_index] -= 1
 
     except Exception as e:
         error_message = str(e)
-        if "No healthy servers available." in error_message or "Connection refused" in error_message:
-            print(f"[{client_addr[0]}:{client_addr[1]}] -> ERROR: All servers down. Returning 503.")
+        if replied[0]:
+            # Part of the response is already out: all that is left is to cut the connection
+            logger.error(f"[{client_addr[0]}:{client_addr[1]}] -> Async error mid-response: {e}")
+        elif "No healthy servers available." in error_message or isinstance(e, ConnectionRefusedError):
+            logger.error(f"[{client_addr[0]}:{client_addr[1]}] -> ERROR: All servers down. Returning 503.")
             client_writer.write(SERVICE_UNAVAILABLE_RESPONSE)
         else:
-            print(f"[{client_addr[0]}:{client_addr[1]}] -> Async error: {e}")
+            logger.error(f"[{client_addr[0]}:{client_addr[1]}] -> Async error: {e}")
             client_writer.write(SERVICE_UNAVAILABLE_RESPONSE)
 
     finally:
-        # 6. Close the connection
+        # 5. Close the client connection and hand the backend one back to the pool
         client_writer.close()
-        await client_writer.wait_closed()
-        if 'backend_writer' in locals():
-            backend_writer.close()
-            await backend_writer.wait_closed()
-        print(f"[{client_addr[0]}:{client_addr[1]}] -> Connection closed.")
-        
+        if backend_sock is not None:
+            if reusable:
+                release_backend(backend_endpoint, backend_sock)
+            else:
+                backend_sock.close()
+        if debug:
+            logger.debug(f"[{client_addr[0]}:{client_addr[1]}] -> Connection closed.")
 
-async def start_load_balancer_async():
+    # Awaited outside the finally block: mypyc-compiled code re-raises an exception that
+    # was already handled above if it passed an inner finally and this block then awaits
+    await client_writer.wait_closed()
+
+def create_listen_socket() -> socket.socket:
+    """Creates the listening socket, shareable across workers via SO_REUSEPORT."""
+    listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    tune_socket(listen_sock) # Accepted client sockets inherit these options
+    listen_sock.bind(('0.0.0.0', LISTEN_PORT)) # Listen on all interfaces
+    listen_sock.listen(LISTEN_BACKLOG)
+    listen_sock.setblocking(False)
+    return listen_sock
+
+async def start_load_balancer_async() -> None:
     """Starts the load balancer listener and the health checker tasks."""
 
     # 1. Start the health check as a background task
     health_task = asyncio.create_task(health_checker_async())
-    print("Health check task started.")
+    logger.info("Health check task started.")
     
     # 2. Start the main listener server
+    listen_sock = create_listen_socket()
     server = await asyncio.start_server(
-        async_proxy_handler, 
-        '0.0.0.0', # Listen on all interfaces
-        LISTEN_PORT
+        async_proxy_handler,
+        sock=listen_sock,
+        backlog=LISTEN_BACKLOG # asyncio calls listen() again with this value
     )
 
-    addr = server.sockets[0].getsockname()
-    print(f"Async Load Balancer running on port {addr[1]}. Backends: {len(SERVER_STATE)} defined.")
+    addr = listen_sock.getsockname()
+    logger.info(f"Async Load Balancer worker {os.getpid()} running on port {addr[1]}. Backends: {len(SERVER_STATE)} defined.")
 
     # 3. Run forever
     async with server:
         await server.serve_forever()
 
-if __name__ == '__main__':
+def start_logging() -> logging.handlers.QueueListener:
+    """Sends log records through a queue to a background thread, so the event loop never blocks on stdout."""
+    log_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue(-1)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+def interrupt_worker(signum: int, frame: Any) -> None:
+    """Turns the first SIGINT or SIGTERM into KeyboardInterrupt and ignores later ones, so shutdown runs once."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+def run_worker() -> None:
+    """Runs one load balancer event loop until it is interrupted."""
+    # Ctrl+C reaches the worker directly, a plain kill arrives forwarded from the parent
+    signal.signal(signal.SIGINT, interrupt_worker)
+    signal.signal(signal.SIGTERM, interrupt_worker)
+
+    # Started here rather than at import, since the listener thread does not survive fork()
+    listener = start_logging()
     try:
-        asyncio.run(start_load_balancer_async())
+        if uvloop is not None:
+            uvloop.run(start_load_balancer_async())
+        else:
+            asyncio.run(start_load_balancer_async())
     except KeyboardInterrupt:
-        print("\nStopping Load Balancer...")
+        pass
     except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+    finally:
+        listener.stop()
 
+def run_workers() -> None:
+    """Forks WORKER_COUNT workers that share LISTEN_PORT and waits for all of them to exit."""
+    worker_pids: list[int] = []
+    for _ in range(WORKER_COUNT):
+        pid = os.fork()
+        if pid == 0:
+            run_worker()
+            sys.stdout.flush()
+            os._exit(0)
+        worker_pids.append(pid)
 
+    def stop_workers(signum: int, frame: Any) -> None:
+        # A signal sent only to the parent must not leave workers accepting on LISTEN_PORT
+        for pid in list(worker_pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
 
+    signal.signal(signal.SIGINT, stop_workers)
+    signal.signal(signal.SIGTERM, stop_workers)
 
+    while worker_pids:
+        pid, _ = os.wait()
+        worker_pids.remove(pid)
+
+def main() -> None:
+    """Entry point; also importable so a mypyc-compiled build can be started with load_balancer.main()."""
+    if WORKER_COUNT > 1 and hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT'):
+        run_workers()
+    else:
+        run_worker()
+    print("\nStopping Load Balancer...")
+
+if __name__ == '__main__':
+    main()
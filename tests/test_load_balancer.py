@@ -0,0 +1,211 @@
+import socket
+import asyncio
+import unittest
+from unittest import mock
+
+import load_balancer
+
+
+class RequestLengthTest(unittest.TestCase):
+    """request_length decides whether the first client read held exactly one request."""
+
+    def test_simple_request(self) -> None:
+        request = b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+        self.assertEqual(load_balancer.request_length(request), len(request))
+
+    def test_pipelined_requests(self) -> None:
+        first = b"GET /a HTTP/1.1\r\nHost: x\r\n\r\n"
+        second = b"GET /b HTTP/1.1\r\nHost: x\r\n\r\n"
+        self.assertEqual(load_balancer.request_length(first + second), len(first))
+
+    def test_partial_head(self) -> None:
+        self.assertIsNone(load_balancer.request_length(b"GET / HTTP/1.1\r\nHost: x\r\n"))
+
+    def test_content_length_body(self) -> None:
+        request = b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello"
+        self.assertEqual(load_balancer.request_length(request), len(request))
+        self.assertEqual(load_balancer.request_length(request + b"GET / HTTP/1.1\r\n\r\n"), len(request))
+        self.assertIsNone(load_balancer.request_length(request[:-1]))
+
+    def test_chunked_body(self) -> None:
+        request = (b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+                   b"5;ext=1\r\nhello\r\n0\r\nX-Trailer: 1\r\n\r\n")
+        self.assertEqual(load_balancer.request_length(request), len(request))
+        self.assertEqual(load_balancer.request_length(request + b"GET / HTTP/1.1\r\n\r\n"), len(request))
+        for end in range(request.index(b"\r\n\r\n") + 4, len(request)):
+            self.assertIsNone(load_balancer.request_length(request[:end]), end)
+
+    def test_malformed_framing(self) -> None:
+        self.assertIsNone(load_balancer.request_length(b"POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n"))
+        self.assertIsNone(load_balancer.request_length(
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n"
+        ))
+
+
+class ResponseHeadTest(unittest.TestCase):
+
+    def test_parse_response_head(self) -> None:
+        parse = load_balancer.parse_response_head
+        self.assertEqual(parse(b"HTTP/1.1 200 OK\r\nContent-Length: 12"), (200, 12, False, True))
+        self.assertEqual(parse(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked"), (200, None, True, True))
+        self.assertEqual(parse(b"HTTP/1.1 200 OK\r\nConnection: close"), (200, None, False, False))
+        self.assertEqual(parse(b"HTTP/1.0 200 OK"), (200, None, False, False))
+        self.assertEqual(parse(b"HTTP/1.0 200 OK\r\nConnection: Keep-Alive"), (200, None, False, True))
+
+    def test_mark_connection_close(self) -> None:
+        buf = bytearray(b"HTTP/1.1 200 OK\r\nConnection: keep-alive\r\nKeep-Alive: timeout=5\r\n"
+                        b"Content-Length: 2\r\n\r\nhi")
+        head_end = load_balancer.mark_connection_close(buf, buf.index(b"\r\n\r\n") + 4)
+        self.assertEqual(bytes(buf), b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nhi")
+        self.assertEqual(head_end, len(buf) - 2)
+
+
+class RelayResponseTest(unittest.IsolatedAsyncioTestCase):
+    """Runs relay_response between socket pairs standing in for the backend and the client."""
+
+    use_splice = load_balancer.USE_SPLICE
+
+    def setUp(self) -> None:
+        patcher = mock.patch.object(load_balancer, 'USE_SPLICE', self.use_splice)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def relay(self, pieces: list[bytes], head_request: bool = False,
+                    close: bool = False) -> tuple[bool, bytes]:
+        """Sends pieces from the backend one read at a time; returns (reusable, bytes the client got)."""
+        loop = asyncio.get_running_loop()
+        backend_sock, backend = socket.socketpair()
+        client_sock, client = socket.socketpair()
+        for sock in (backend_sock, backend, client_sock, client):
+            sock.setblocking(False)
+            self.addCleanup(sock.close)
+
+        async def serve() -> None:
+            for piece in pieces:
+                await loop.sock_sendall(backend, piece)
+                await asyncio.sleep(0.005)
+            if close:
+                backend.shutdown(socket.SHUT_WR)
+
+        async def receive() -> bytes:
+            received = bytearray()
+            while True:
+                data = await loop.sock_recv(client, 65536)
+                if not data:
+                    return bytes(received)
+                received += data
+
+        server = asyncio.create_task(serve())
+        reader = asyncio.create_task(receive())
+        reusable = await asyncio.wait_for(
+            load_balancer.relay_response(backend_sock, client_sock, bytearray(), head_request, [False]), 5
+        )
+        await server
+        client_sock.shutdown(socket.SHUT_WR)
+        return reusable, await asyncio.wait_for(reader, 5)
+
+    async def test_content_length(self) -> None:
+        reusable, received = await self.relay([b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello"])
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\nConnection: close\r\n\r\nhello")
+
+    async def test_content_length_split_across_reads(self) -> None:
+        body = bytes(range(256)) * 1200
+        response = b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body
+        reusable, received = await self.relay([response[:10], response[10:50], response[50:70000], response[70000:]])
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+
+    async def test_chunked_split_across_reads(self) -> None:
+        body = b"4\r\nWiki\r\n5\r\npedia\r\ne\r\n in\r\n\r\nchunks.\r\n0\r\n\r\n"
+        response = b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + body
+        for step in (1, 3, 7, len(response)):
+            with self.subTest(step=step):
+                pieces = [response[i:i + step] for i in range(0, len(response), step)]
+                reusable, received = await self.relay(pieces)
+                self.assertTrue(reusable)
+                self.assertEqual(received, b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n" + body)
+
+    async def test_chunk_extensions_and_trailers(self) -> None:
+        body = b"5;name=value\r\nhello\r\n6;x\r\n world\r\n0;last\r\nX-Checksum: 1\r\nX-Other: 2\r\n\r\n"
+        reusable, received = await self.relay(
+            [b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + body[:30], body[30:]]
+        )
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n" + body)
+
+    async def test_large_chunks(self) -> None:
+        chunk = bytes(range(256)) * 400
+        body = b"%x\r\n" % len(chunk) + chunk + b"\r\n" + b"%x\r\n" % len(chunk) + chunk + b"\r\n0\r\n\r\n"
+        reusable, received = await self.relay(
+            [b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + body[:1000], body[1000:]]
+        )
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n" + body)
+
+    async def test_head_request(self) -> None:
+        reusable, received = await self.relay([b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n"], head_request=True)
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\nConnection: close\r\n\r\n")
+
+    async def test_bodiless_statuses(self) -> None:
+        for status in (b"204 No Content", b"304 Not Modified"):
+            with self.subTest(status=status):
+                reusable, received = await self.relay([b"HTTP/1.1 " + status + b"\r\nETag: x\r\n\r\n"])
+                self.assertTrue(reusable)
+                self.assertEqual(received, b"HTTP/1.1 " + status + b"\r\nETag: x\r\nConnection: close\r\n\r\n")
+
+    async def test_interim_response(self) -> None:
+        reusable, received = await self.relay(
+            [b"HTTP/1.1 100 Continue\r\n\r\n", b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"]
+        )
+        self.assertTrue(reusable)
+        self.assertEqual(received, b"HTTP/1.1 100 Continue\r\n\r\n"
+                                   b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok")
+
+    async def test_close_delimited(self) -> None:
+        reusable, received = await self.relay([b"HTTP/1.1 200 OK\r\n\r\nuntil", b" the end"], close=True)
+        self.assertFalse(reusable)
+        self.assertEqual(received, b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nuntil the end")
+
+    async def test_backend_closes_keep_alive(self) -> None:
+        for head in (b"HTTP/1.1 200 OK\r\nConnection: close", b"HTTP/1.0 200 OK"):
+            with self.subTest(head=head):
+                reusable, received = await self.relay([head + b"\r\nContent-Length: 2\r\n\r\nok"])
+                self.assertFalse(reusable)
+                self.assertEqual(received.count(b"Connection: close"), 1)
+                self.assertTrue(received.endswith(b"\r\n\r\nok"))
+
+    async def test_leftover_bytes(self) -> None:
+        leftover = b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nother"
+        for response in (b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok",
+                         b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\nok\r\n0\r\n\r\n"):
+            with self.subTest(response=response):
+                reusable, received = await self.relay([response + leftover])
+                self.assertFalse(reusable)
+                self.assertNotIn(b"other", received)
+
+    async def test_truncated_body(self) -> None:
+        replied = [False]
+        loop = asyncio.get_running_loop()
+        backend_sock, backend = socket.socketpair()
+        client_sock, client = socket.socketpair()
+        for sock in (backend_sock, backend, client_sock, client):
+            sock.setblocking(False)
+            self.addCleanup(sock.close)
+        await loop.sock_sendall(backend, b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\npart")
+        backend.shutdown(socket.SHUT_WR)
+        with self.assertRaises(ConnectionResetError):
+            await load_balancer.relay_response(backend_sock, client_sock, bytearray(), False, replied)
+        self.assertTrue(replied[0])
+
+
+@unittest.skipUnless(load_balancer.USE_SPLICE, "the copy path is already what RelayResponseTest runs")
+class RelayResponseCopyTest(RelayResponseTest):
+    """The same responses through the recv_into/sendall path used where splice is unavailable."""
+
+    use_splice = False
+
+
+if __name__ == '__main__':
+    unittest.main()